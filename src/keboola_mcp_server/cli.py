@@ -1,6 +1,7 @@
 """Command-line interface for the Keboola MCP server."""
 
 import argparse
+import asyncio
 import logging
 import sys
 from typing import List, Optional
@@ -40,6 +41,29 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     return parser.parse_args(args)
 
 
+def configure_logging(log_level: str) -> None:
+    """Send the server's log records to stderr.
+
+    Args:
+        log_level: Logging level for the keboola_mcp_server loggers
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    package_logger = logging.getLogger("keboola_mcp_server")
+    package_logger.addHandler(handler)
+    package_logger.setLevel(log_level)
+
+
+def install_uvloop() -> None:
+    """Run the server on uvloop instead of the default asyncio event loop when available."""
+    try:
+        import uvloop
+    except ImportError:
+        logger.debug("uvloop is not installed, using the default asyncio event loop")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
 def main(args: Optional[List[str]] = None) -> None:
     """Run the MCP server.
 
@@ -53,13 +77,15 @@ def main(args: Optional[List[str]] = None) -> None:
     if parsed_args.api_url:
         config.storage_api_url = parsed_args.api_url
     config.log_level = parsed_args.log_level
+    configure_logging(config.log_level)
 
     try:
         # Create and run server
         mcp = create_server(config)
+        install_uvloop()
         mcp.run(transport=parsed_args.transport)
     except Exception as e:
-        logger.error(f"Server failed: {e}")
+        logger.error("Server failed: %s", e)
         sys.exit(1)
 
 
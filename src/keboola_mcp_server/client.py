@@ -1,27 +1,54 @@
 """Keboola Storage API client wrapper."""
 
+import asyncio
+import functools
 import logging
 import os
 import tempfile
-from typing import Any, Dict, Optional, cast
+import time
+from types import TracebackType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
 
 import httpx
-from kbcstorage.client import Client
+import orjson
+
+if TYPE_CHECKING:
+    from kbcstorage.client import Client
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class KeboolaClient:
     """Helper class to interact with Keboola Storage API."""
 
     def __init__(
-        self, storage_api_token: str, storage_api_url: str = "https://connection.keboola.com"
+        self,
+        storage_api_token: str,
+        storage_api_url: str = "https://connection.keboola.com",
+        cache_ttl: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
     ) -> None:
         """Initialize the client.
 
         Args:
             storage_api_token: Keboola Storage API token
             storage_api_url: Keboola Storage API URL
+            cache_ttl: Number of seconds GET responses are cached for
+            transport: Transport used by the HTTP client instead of the network one
         """
         self.token = storage_api_token
         # Ensure the base URL has a scheme
@@ -31,26 +58,131 @@ class KeboolaClient:
         self.headers = {
             "X-StorageApi-Token": self.token,
             "Content-Type": "application/json",
-            "Accept-encoding": "gzip",
+            "Accept-Encoding": "gzip, deflate, br",
         }
-        # Initialize the official client for operations it handles well
-        self.storage_client = Client(self.base_url, self.token)
+        # Shared HTTP client so keep-alive connections are reused across requests and
+        # concurrent requests are multiplexed over HTTP/2
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.base_url}/v2/storage/",
+            headers=self.headers,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=httpx.Timeout(30.0),
+            transport=transport,
+        )
+        # GET responses keyed by endpoint, stored with their fetch time
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._cache_ttl = cache_ttl
+        self._cache_locks: Dict[str, asyncio.Lock] = {}
+
+    @functools.cached_property
+    def storage_client(self) -> "Client":
+        """Official Storage API client, created on first use for operations it handles well."""
+        # Imported lazily as only table exports need the SDK
+        from kbcstorage.client import Client
+
+        return Client(self.base_url, self.token)
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pool."""
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "KeboolaClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.aclose()
 
     async def get(self, endpoint: str) -> Dict[str, Any]:
         """Make a GET request to Keboola Storage API.
 
+        Responses are cached for `cache_ttl` seconds and concurrent requests for
+        the same endpoint share a single API call.
+
         Args:
             endpoint: API endpoint to call
 
         Returns:
             API response as dictionary
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/v2/storage/{endpoint}", headers=self.headers
-            )
-            response.raise_for_status()
-            return cast(Dict[str, Any], response.json())
+        _, data = await self._cached(endpoint, lambda: self._fetch(endpoint))
+        return cast(Dict[str, Any], data)
+
+    async def get_parsed(self, endpoint: str, parse: Callable[[Any], T]) -> T:
+        """Make a GET request and convert the response with `parse`.
+
+        The converted value is cached next to the raw response and expires with
+        it, so `parse` runs once per fetch instead of on every call.
+
+        Args:
+            endpoint: API endpoint to call
+            parse: Function converting the decoded API response
+
+        Returns:
+            Converted API response
+        """
+
+        async def fetch() -> Tuple[float, T]:
+            # Keep the fetch time of the raw response so both entries expire together
+            fetched_at, data = await self._cached(endpoint, lambda: self._fetch(endpoint))
+            return fetched_at, parse(data)
+
+        _, parsed = await self._cached(f"{endpoint}#{parse.__qualname__}", fetch)
+        return cast(T, parsed)
+
+    async def _cached(
+        self, key: str, fetch: Callable[[], Awaitable[Tuple[float, Any]]]
+    ) -> Tuple[float, Any]:
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+            return cached
+
+        lock = self._cache_locks.get(key)
+        if lock is None:
+            lock = self._cache_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another caller may have fetched the value while we waited
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+                return cached
+
+            try:
+                entry = await fetch()
+            finally:
+                # Callers already waiting keep their reference; later ones hit the cache
+                if self._cache_locks.get(key) is lock:
+                    del self._cache_locks[key]
+            self._store(key, entry)
+            return entry
+
+    def _store(self, key: str, entry: Tuple[float, Any]) -> None:
+        now = time.monotonic()
+        # Evict expired entries so endpoints requested once do not pile up
+        for stale in [
+            k for k, (fetched_at, _) in self._cache.items() if now - fetched_at >= self._cache_ttl
+        ]:
+            del self._cache[stale]
+        self._cache[key] = entry
+
+    async def _fetch(self, endpoint: str) -> Tuple[float, Any]:
+        response = await self._client.get(endpoint)
+        response.raise_for_status()
+        return time.monotonic(), orjson.loads(response.content)
+
+    def invalidate(self, prefix: str = "") -> None:
+        """Drop cached GET responses.
+
+        Args:
+            prefix: Only endpoints starting with this prefix are dropped. Drops
+                everything when empty.
+        """
+        for endpoint in [e for e in self._cache if e.startswith(prefix)]:
+            del self._cache[endpoint]
 
     async def post(self, endpoint: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Make a POST request to Keboola Storage API.
@@ -62,14 +194,48 @@ class KeboolaClient:
         Returns:
             API response as dictionary
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/v2/storage/{endpoint}",
-                headers=self.headers,
-                json=data if data is not None else {},
-            )
+        response = await self._client.post(endpoint, json=data if data is not None else {})
+        response.raise_for_status()
+        # Any write may change what cached listings and details return
+        self.invalidate()
+        return cast(Dict[str, Any], orjson.loads(response.content))
+
+    async def get_table_preview(self, table_id: str, limit: int = 100) -> str:
+        """Get the header and first rows of a table as CSV.
+
+        The data preview is streamed and the transfer is aborted as soon as
+        enough rows have been read.
+
+        Args:
+            table_id: ID of the table to preview
+            limit: Maximum number of data rows to return
+
+        Returns:
+            CSV data with a header row followed by at most `limit` rows
+        """
+        lines: List[str] = []
+        records = 0
+        quotes = 0
+        buffer = ""
+        async with self._client.stream(
+            "GET", f"tables/{table_id}/data-preview", params={"limit": limit}
+        ) as response:
             response.raise_for_status()
-            return cast(Dict[str, Any], response.json())
+            async for chunk in response.aiter_text():
+                buffer += chunk
+                # Split on "\n" only and keep the terminators, so other line breaks and
+                # "\r\n" inside quoted fields come back unchanged
+                while (end := buffer.find("\n")) != -1:
+                    line, buffer = buffer[: end + 1], buffer[end + 1 :]
+                    lines.append(line)
+                    # A record is complete once all its quoted fields are closed
+                    quotes += line.count('"')
+                    if quotes % 2 == 0:
+                        records += 1
+                        if records > limit:
+                            return "".join(lines).removesuffix("\n").removesuffix("\r")
+        lines.append(buffer)
+        return "".join(lines).removesuffix("\n").removesuffix("\r")
 
     async def download_table_data_async(self, table_id: str) -> str:
         """Download table data using the export endpoint.
@@ -81,16 +247,19 @@ class KeboolaClient:
             Table data as string
         """
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Get just the table name from the table_id
-                table_name = table_id.split(".")[-1]
-                # Export the table data
-                self.storage_client.tables.export_to_file(table_id, temp_dir)
-                # Read the exported file
-                actual_file = os.path.join(temp_dir, table_name)
-                with open(actual_file, "r") as f:
-                    data = f.read()
-                return data
+            # The SDK export is blocking, so keep it off the event loop
+            return await asyncio.to_thread(self._download_table_data, table_id)
         except Exception as e:
-            logger.error(f"Error downloading table {table_id}: {str(e)}")
+            logger.error("Error downloading table %s: %s", table_id, e)
             return f"Error downloading table: {str(e)}"
+
+    def _download_table_data(self, table_id: str) -> str:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Get just the table name from the table_id
+            table_name = table_id.split(".")[-1]
+            # Export the table data
+            self.storage_client.tables.export_to_file(table_id, temp_dir)
+            # Read the exported file
+            actual_file = os.path.join(temp_dir, table_name)
+            with open(actual_file, "r") as f:
+                return f.read()
@@ -0,0 +1,294 @@
+"""Snowflake connection handling for the Keboola MCP server."""
+
+import asyncio
+import csv
+import logging
+import re
+from contextlib import asynccontextmanager
+from io import StringIO
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, cast
+
+import snowflake.connector
+from snowflake.connector.connection import SnowflakeConnection
+from snowflake.connector.cursor import SnowflakeCursor
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Number of rows fetched from Snowflake at a time when building query results
+FETCH_BATCH_SIZE = 10_000
+
+# Only read-only statements are batched, so a failed batch can safely be retried
+_BATCHABLE_STATEMENT = re.compile(r"(SELECT|WITH)\b", re.IGNORECASE)
+
+
+def _fetch_csv(cursor: SnowflakeCursor) -> str:
+    """Convert the current result set of a cursor to CSV."""
+    # Write batch by batch instead of materializing all rows
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(col[0] for col in cursor.description)
+    while rows := cursor.fetchmany(FETCH_BATCH_SIZE):
+        writer.writerows(rows)
+    return output.getvalue()
+
+
+def _run_statements(connection: SnowflakeConnection, queries: List[str]) -> List[str]:
+    """Execute queries in one round trip and return each result as CSV."""
+    cursor = connection.cursor()
+    try:
+        if len(queries) == 1:
+            cursor.execute(queries[0])
+        else:
+            # Separators go on their own line so a trailing comment cannot swallow them
+            statements = "\n;\n".join(_strip_statement(query) for query in queries)
+            cursor.execute(statements, num_statements=len(queries))
+        results = [_fetch_csv(cursor)]
+        while len(results) < len(queries) and cursor.nextset():
+            results.append(_fetch_csv(cursor))
+        return results
+    finally:
+        cursor.close()
+
+
+def _strip_statement(query: str) -> str:
+    """Remove surrounding whitespace and trailing semicolons from a statement."""
+    return query.strip().rstrip(";").rstrip()
+
+
+def _is_batchable(query: str) -> bool:
+    """Check whether a query is a single read-only statement that can join a batch."""
+    statement = _strip_statement(query)
+    return ";" not in statement and _BATCHABLE_STATEMENT.match(statement) is not None
+
+
+class ConnectionManager:
+    """Keeps one Snowflake connection open and shares it between queries."""
+
+    def __init__(self, config: Config) -> None:
+        """Initialize the manager.
+
+        Args:
+            config: Server configuration with Snowflake credentials
+        """
+        self.config = config
+        self._connection: Optional[SnowflakeConnection] = None
+        # Number of blocks currently borrowing each connection
+        self._users: Dict[SnowflakeConnection, int] = {}
+        self._lock = asyncio.Lock()
+
+    def _connect(self) -> SnowflakeConnection:
+        return snowflake.connector.connect(
+            account=self.config.snowflake_account,
+            user=self.config.snowflake_user,
+            password=self.config.snowflake_password,
+            warehouse=self.config.snowflake_warehouse,
+            database=self.config.snowflake_database,
+            schema=self.config.snowflake_schema,
+            role=self.config.snowflake_role,
+            client_session_keep_alive=True,
+        )
+
+    def get_connection(self) -> SnowflakeConnection:
+        """Get the pooled connection, opening a new one if it is missing or closed.
+
+        Returns:
+            Open Snowflake connection
+        """
+        if self._connection is None or self._connection.is_closed():
+            logger.info("Opening Snowflake connection")
+            self._connection = self._connect()
+        return self._connection
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[SnowflakeConnection]:
+        """Borrow the pooled connection for the duration of the block.
+
+        The connection is dropped if the block fails with anything other than a
+        query error, so the next caller reconnects. It is closed once every block
+        still using it has finished.
+        """
+        async with self._lock:
+            connection = await asyncio.to_thread(self.get_connection)
+            self._users[connection] = self._users.get(connection, 0) + 1
+        try:
+            yield connection
+        except snowflake.connector.errors.ProgrammingError:
+            raise
+        except Exception:
+            async with self._lock:
+                if self._connection is connection:
+                    self._connection = None
+            raise
+        finally:
+            await self._release(connection)
+
+    async def _release(self, connection: SnowflakeConnection) -> None:
+        async with self._lock:
+            self._users[connection] -= 1
+            if self._users[connection]:
+                return
+            del self._users[connection]
+            if self._connection is connection:
+                return
+        await self._close(connection)
+
+    async def _close(self, connection: SnowflakeConnection) -> None:
+        try:
+            await asyncio.to_thread(connection.close)
+        except Exception as e:
+            logger.warning("Failed to close Snowflake connection: %s", e)
+
+    async def close(self) -> None:
+        """Close the pooled connection, or leave it to be closed by its last user."""
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if connection is None or connection in self._users:
+                return
+        await self._close(connection)
+
+
+class QueryBatcher:
+    """Coalesces queries submitted close together into one multi-statement execution.
+
+    Queries arriving within `max_wait` seconds of the first one, up to `max_batch` of
+    them, are sent to Snowflake as a single request and each caller receives the
+    result of its own statement. Only single SELECT and WITH queries are batched;
+    anything else runs on its own.
+    """
+
+    def __init__(
+        self, connection_manager: ConnectionManager, max_batch: int = 8, max_wait: float = 0.005
+    ) -> None:
+        """Initialize the batcher.
+
+        Args:
+            connection_manager: Manager providing the Snowflake connection
+            max_batch: Maximum number of queries sent in one request
+            max_wait: Seconds to wait for more queries after the first one arrives
+        """
+        self.connection_manager = connection_manager
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future[str]]]" = asyncio.Queue()
+        self._collector: Optional[asyncio.Task[None]] = None
+        self._batches: Set[asyncio.Task[None]] = set()
+
+    async def execute(self, query: str) -> str:
+        """Execute a query, possibly together with other pending queries.
+
+        Args:
+            query: SQL query to execute
+
+        Returns:
+            Query result as CSV
+        """
+        if self._collector is None or self._collector.done():
+            self._collector = asyncio.create_task(self._collect())
+        future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Tuple[str, "asyncio.Future[str]"]] = []
+        try:
+            # Runs until the queue drains; execute() starts a new collector when needed
+            while not self._queue.empty():
+                query, future = self._queue.get_nowait()
+                if not _is_batchable(query):
+                    self._submit([(query, future)])
+                    continue
+
+                batch = [(query, future)]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if _is_batchable(item[0]):
+                        batch.append(item)
+                    else:
+                        self._submit([item])
+                self._submit(batch)
+        except asyncio.CancelledError:
+            # Fail the batch that was still being collected; submitted ones fail on their own
+            for _, future in batch:
+                _resolve(future, exception=RuntimeError("Query batcher closed"))
+            raise
+
+    def _submit(self, batch: List[Tuple[str, "asyncio.Future[str]"]]) -> None:
+        # Run batches as separate tasks so collecting the next one is not delayed
+        task = asyncio.create_task(self._execute_batch(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+        task.add_done_callback(lambda task: self._fail_unresolved(task, batch))
+
+    @staticmethod
+    def _fail_unresolved(
+        task: "asyncio.Task[None]", batch: List[Tuple[str, "asyncio.Future[str]"]]
+    ) -> None:
+        # A batch cancelled by close(), possibly before it started, or one that crashed
+        # must not leave its callers waiting
+        if task.cancelled():
+            error: BaseException = RuntimeError("Query batcher closed")
+        else:
+            error = task.exception() or RuntimeError("Query batch ended without a result")
+        for _, future in batch:
+            _resolve(future, exception=error)
+
+    async def _execute_batch(self, batch: List[Tuple[str, "asyncio.Future[str]"]]) -> None:
+        batch = [(query, future) for query, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            async with self.connection_manager.acquire() as connection:
+                results = await asyncio.to_thread(
+                    _run_statements, connection, [query for query, _ in batch]
+                )
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], exception=e)
+                return
+            # Run the read-only queries one by one so a failing query only fails its own caller
+            logger.debug("Batch of %d queries failed, retrying individually: %s", len(batch), e)
+            await asyncio.gather(*(self._execute_batch([item]) for item in batch))
+            return
+
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result=result)
+        # Never leave a caller waiting when fewer result sets came back than were expected
+        for _, future in batch[len(results) :]:
+            _resolve(future, exception=RuntimeError("Snowflake returned no result for the query"))
+
+    async def close(self) -> None:
+        """Stop collecting queries and fail any that are still pending."""
+        tasks = list(self._batches)
+        if self._collector is not None:
+            tasks.append(self._collector)
+            self._collector = None
+        for task in tasks:
+            task.cancel()
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            _resolve(future, exception=RuntimeError("Query batcher closed"))
+        # Let the cancelled tasks fail the callers they were serving
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _resolve(
+    future: "asyncio.Future[str]",
+    result: Optional[str] = None,
+    exception: Optional[BaseException] = None,
+) -> None:
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(cast(str, result))
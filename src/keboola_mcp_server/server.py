@@ -1,53 +1,212 @@
 """MCP server implementation for Keboola Connection."""
 
-import csv
-import json
+import asyncio
+import functools
 import logging
-import os
-import tempfile
-from io import StringIO
-from typing import Any, AsyncGenerator, Dict, List, Optional, TypedDict, cast
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union, cast
 
-import pandas as pd
 import snowflake.connector
 from mcp.server.fastmcp import FastMCP
-from snowflake.connector.connection import SnowflakeConnection
-from snowflake.snowpark import Session
-from snowflake.snowpark.functions import col
 
 from .client import KeboolaClient
 from .config import Config
+from .database import ConnectionManager, QueryBatcher
 
 logger = logging.getLogger(__name__)
 
-
-class BucketInfo(TypedDict):
-    id: str
-    name: str
-    description: str
-    stage: str
-    created: str
-    tablesCount: int
-    dataSizeBytes: int
+T = TypeVar("T")
+
+# Maximum number of Storage API requests issued concurrently by fan-out tools
+MAX_CONCURRENT_REQUESTS = 16
+
+# Output templates for listings, filled via str.format with parsed API objects
+_BUCKET_TPL = (
+    "### {b.name} ({b.id})\n"
+    "    - Stage: {b.stage}\n"
+    "    - Description: {b.description}\n"
+    "    - Created: {b.created}\n"
+    "    - Tables: {b.tables_count}\n"
+    "    - Size: {b.data_size_bytes} bytes"
+)
+_TABLE_SUMMARY_TPL = "- {t.id}: {t.name} (Rows: {rows})"
+_TABLE_TPL = (
+    "Table: {t.id}\n"
+    "Name: {t.name}\n"
+    "Rows: {rows}\n"
+    "Size: {t.data_size_bytes} bytes\n"
+    "Columns: {columns}\n"
+    "---"
+)
+_COMPONENT_TPL = "- {c.id}: {c.name}"
+_CONFIG_TPL = (
+    "Configuration: {id}\n"
+    "Name: {name}\n"
+    "Description: {description}\n"
+    "Created: {created}\n"
+    "---"
+)
+_CONFIG_DEFAULTS = {"description": "No description"}
+
+# SELECT statements for query_table_data, indexed by (has_where << 1) | has_limit
+_SQL_TEMPLATES = (
+    "SELECT {c} FROM {t}",
+    "SELECT {c} FROM {t} LIMIT {l}",
+    "SELECT {c} FROM {t} WHERE {w}",
+    "SELECT {c} FROM {t} WHERE {w} LIMIT {l}",
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _quote_identifier(name: str) -> str:
+    """Quote a column name for use in Snowflake SQL."""
+    return f'"{name}"'
+
+
+def _build_select(
+    select_clause: str, table: str, where: Optional[str] = None, limit: Optional[int] = None
+) -> str:
+    """Build the SELECT statement run by query_table_data."""
+    if limit:
+        # Only ever interpolate an integer into the LIMIT clause
+        limit = int(limit)
+    return _SQL_TEMPLATES[(bool(where) << 1) | bool(limit)].format(
+        c=select_clause, t=table, w=where, l=limit
+    )
 
 
-class TableColumnInfo(TypedDict):
+@dataclass(slots=True, frozen=True)
+class TableColumnInfo:
     name: str
     db_identifier: str
 
 
-class TableDetail(TypedDict):
+@dataclass(slots=True, frozen=True)
+class TableDetail:
     id: str
     name: str
-    primary_key: List[str]
+    primary_key: Tuple[str, ...]
     created: str
     row_count: int
     data_size_bytes: int
-    columns: List[str]
-    column_identifiers: List[TableColumnInfo]
+    columns: Tuple[str, ...]
+    column_identifiers: Tuple[TableColumnInfo, ...]
     db_identifier: str
 
 
+@dataclass(slots=True, frozen=True)
+class Bucket:
+    """Bucket from a Storage API listing with display defaults filled in."""
+
+    id: str
+    name: str
+    stage: str = "N/A"
+    description: str = "N/A"
+    created: str = "N/A"
+    tables_count: int = 0
+    data_size_bytes: int = 0
+
+
+@dataclass(slots=True, frozen=True)
+class Table:
+    """Table from a Storage API listing with display defaults filled in."""
+
+    id: str
+    name: str = "N/A"
+    # Left unset when missing as listings show different placeholders for it
+    rows_count: Optional[int] = None
+    data_size_bytes: Union[int, str] = "N/A"
+    columns: Tuple[str, ...] = ()
+
+
+@dataclass(slots=True, frozen=True)
+class Component:
+    """Component from a Storage API listing."""
+
+    id: str
+    name: str
+
+
+# API response key -> dataclass attribute
+_BUCKET_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "stage": "stage",
+    "description": "description",
+    "created": "created",
+    "tablesCount": "tables_count",
+    "dataSizeBytes": "data_size_bytes",
+}
+_TABLE_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "rowsCount": "rows_count",
+    "dataSizeBytes": "data_size_bytes",
+}
+
+
+def _from_api(cls: Type[T], fields: Dict[str, str], data: Dict[str, Any], **extra: Any) -> T:
+    """Build a dataclass from an API object, leaving missing keys to field defaults."""
+    return cls(**{attr: data[key] for key, attr in fields.items() if key in data}, **extra)
+
+
+def _rows(table: Table, default: str) -> Union[int, str]:
+    """Row count of a table, or `default` when the API did not report one."""
+    return default if table.rows_count is None else table.rows_count
+
+
+def _parse_buckets(data: List[Dict[str, Any]]) -> Tuple[Bucket, ...]:
+    return tuple(_from_api(Bucket, _BUCKET_FIELDS, bucket) for bucket in data)
+
+
+def _parse_tables(data: List[Dict[str, Any]]) -> Tuple[Table, ...]:
+    return tuple(
+        _from_api(Table, _TABLE_FIELDS, table, columns=tuple(table.get("columns", ())))
+        for table in data
+    )
+
+
+def _parse_components(data: List[Dict[str, Any]]) -> Tuple[Component, ...]:
+    return tuple(Component(id=comp["id"], name=comp["name"]) for comp in data)
+
+
+@functools.lru_cache(maxsize=1024)
+def _column_identifiers(columns: Tuple[str, ...]) -> Tuple[TableColumnInfo, ...]:
+    """Describe the DB identifiers of a table's columns."""
+    return tuple(TableColumnInfo(name=col, db_identifier=_quote_identifier(col)) for col in columns)
+
+
+class KeboolaMCP(FastMCP):
+    """FastMCP server that releases shared resources when its transport stops."""
+
+    def __init__(self, name: Optional[str] = None, **settings: Any) -> None:
+        super().__init__(name, **settings)
+        self._shutdown_callbacks: List[Callable[[], Awaitable[None]]] = []
+
+    def on_shutdown(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function to be awaited when the server stops."""
+        self._shutdown_callbacks.append(callback)
+
+    async def _shutdown(self) -> None:
+        for callback in self._shutdown_callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.warning("Shutdown callback failed: %s", e)
+
+    async def run_stdio_async(self) -> None:
+        try:
+            await super().run_stdio_async()
+        finally:
+            await self._shutdown()
+
+    async def run_sse_async(self) -> None:
+        try:
+            await super().run_sse_async()
+        finally:
+            await self._shutdown()
+
+
 def create_server(config: Optional[Config] = None) -> FastMCP:
     """Create and configure the MCP server.
 
@@ -61,25 +220,25 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
         config = Config.from_env()
     config.validate()
 
-    # Configure logging
-    handler = logging.StreamHandler()
-    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-    logger.addHandler(handler)
-    logger.setLevel(config.log_level)
-
     # Initialize FastMCP server with system instructions
-    mcp = FastMCP(
-        "Keboola Explorer", dependencies=["keboola.storage-api-client", "httpx", "pandas"]
-    )
+    mcp = KeboolaMCP("Keboola Explorer", dependencies=["keboola.storage-api-client", "httpx"])
 
     # Create Keboola client instance
     try:
         keboola = KeboolaClient(config.storage_token, config.storage_api_url)
     except Exception as e:
-        logger.error(f"Failed to initialize Keboola client: {e}")
+        logger.error("Failed to initialize Keboola client: %s", e)
         raise
+    mcp.on_shutdown(keboola.aclose)
     logger.info("Successfully initialized Keboola client")
 
+    # Snowflake connection is opened on first query and reused afterwards, with
+    # concurrent queries coalesced into multi-statement requests
+    connection_manager = ConnectionManager(config)
+    query_batcher = QueryBatcher(connection_manager)
+    mcp.on_shutdown(query_batcher.close)
+    mcp.on_shutdown(connection_manager.close)
+
     async def get_table_db_path(table: dict) -> str:
         """Get the database path for a specific table."""
 
@@ -97,28 +256,36 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
         """Get the current database."""
         return f"KEBOOLA_{config.storage_token.split('-')[0]}"
 
+    async def get_buckets() -> Tuple[Bucket, ...]:
+        """Get all buckets in the project."""
+        return await keboola.get_parsed("buckets", _parse_buckets)
+
+    async def get_bucket_tables(bucket_id: str) -> Tuple[Table, ...]:
+        """Get all tables in a specific bucket."""
+        return await keboola.get_parsed(f"buckets/{bucket_id}/tables", _parse_tables)
+
     # Resources
 
     @mcp.resource("keboola://buckets")
-    async def list_buckets() -> List[BucketInfo]:
+    async def list_buckets() -> List[Dict[str, Any]]:
         """List all available buckets in Keboola project."""
-        buckets = cast(List[BucketInfo], keboola.storage_client.buckets.list())
+        # Serve the raw API objects; Bucket only keeps the fields listings display
+        buckets = cast(List[Dict[str, Any]], await keboola.get("buckets"))
         return buckets
 
     @mcp.resource("keboola://buckets/{bucket_id}/tables")
     async def list_bucket_tables(bucket_id: str) -> str:
         """List all tables in a specific bucket."""
-        tables = cast(List[Dict[str, Any]], keboola.storage_client.buckets.list_tables(bucket_id))
+        tables = await get_bucket_tables(bucket_id)
         return "\n".join(
-            f"- {table['id']}: {table['name']} (Rows: {table.get('rowsCount', 'unknown')})"
-            for table in tables
+            _TABLE_SUMMARY_TPL.format(t=table, rows=_rows(table, "unknown")) for table in tables
         )
 
     @mcp.resource("keboola://components")
     async def list_components() -> str:
         """List all available components and their configurations."""
-        components = cast(List[Dict[str, Any]], await keboola.get("components"))
-        return "\n".join(f"- {comp['id']}: {comp['name']}" for comp in components)
+        components = await keboola.get_parsed("components", _parse_components)
+        return "\n".join(_COMPONENT_TPL.format(c=comp) for comp in components)
 
     @mcp.resource(
         "keboola://tables/{table_id}",
@@ -128,21 +295,19 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
         """Get detailed information about a table."""
         table = await get_table_metadata(table_id)
 
-        # Get column info
-        columns = table.get("columns", [])
-        column_info = [TableColumnInfo(name=col, db_identifier=f'"{col}"') for col in columns]
-
-        return {
-            "id": table["id"],
-            "name": table.get("name", "N/A"),
-            "primary_key": table.get("primaryKey", []),
-            "created": table.get("created", "N/A"),
-            "row_count": table.get("rowsCount", 0),
-            "data_size_bytes": table.get("dataSizeBytes", 0),
-            "columns": columns,
-            "column_identifiers": column_info,
-            "db_identifier": await get_table_db_path(table),
-        }
+        columns = tuple(table.get("columns", ()))
+
+        return TableDetail(
+            id=table["id"],
+            name=table.get("name", "N/A"),
+            primary_key=tuple(table.get("primaryKey", ())),
+            created=table.get("created", "N/A"),
+            row_count=table.get("rowsCount", 0),
+            data_size_bytes=table.get("dataSizeBytes", 0),
+            columns=columns,
+            column_identifiers=_column_identifiers(columns),
+            db_identifier=await get_table_db_path(table),
+        )
 
     # TODO: fix the implementation of query_table_data
     # @mcp.tool()
@@ -157,20 +322,13 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
 
         # Build column list with proper identifiers
         if columns:
-            column_map = {
-                col["name"]: col["db_identifier"] for col in table_info["column_identifiers"]
-            }
+            # Identifiers are already cached per column list by get_table_detail
+            column_map = {c.name: c.db_identifier for c in table_info.column_identifiers}
             select_clause = ", ".join(column_map[col] for col in columns)
         else:
             select_clause = "*"
 
-        query = f"SELECT {select_clause} FROM {table_info['db_identifier']}"
-
-        if where:
-            query += f" WHERE {where}"
-
-        if limit:
-            query += f" LIMIT {limit}"
+        query = _build_select(select_clause, table_info.db_identifier, where, limit)
 
         result: str = await query_table(query)
         return result
@@ -188,31 +346,8 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
         if not config.has_snowflake_config():
             raise ValueError("Snowflake credentials not fully configured")
 
-        conn = None
-        cursor = None
-
         try:
-            conn = snowflake.connector.connect(
-                account=config.snowflake_account,
-                user=config.snowflake_user,
-                password=config.snowflake_password,
-                warehouse=config.snowflake_warehouse,
-                database=config.snowflake_database,
-                schema=config.snowflake_schema,
-                role=config.snowflake_role,
-            )
-            
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            result = cursor.fetchall()
-            columns = [col[0] for col in cursor.description]
-
-            # Convert to CSV
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(columns)
-            writer.writerows(result)
-            return output.getvalue()
+            return await query_batcher.execute(sql_query)
 
         except snowflake.connector.errors.ProgrammingError as e:
             raise ValueError(f"Snowflake query error: {str(e)}")
@@ -220,38 +355,49 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
         except Exception as e:
             raise ValueError(f"Unexpected error during query execution: {str(e)}")
 
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
     # Tools
     @mcp.tool()
     async def list_all_buckets() -> str:
         """List all buckets in the project with their basic information."""
-        buckets = await list_buckets()
+        buckets = await get_buckets()
 
-        header = "# Bucket List\n\n"
-        header += f"Total Buckets: {len(buckets)}\n\n"
-        header += "## Details"
+        lines = ["# Bucket List", "", f"Total Buckets: {len(buckets)}", "", "## Details"]
+        lines.extend(_BUCKET_TPL.format(b=bucket) for bucket in buckets)
+        return "\n".join(lines)
 
-        bucket_details = []
-        for bucket in buckets:
-            detail = f"### {bucket['name']} ({bucket['id']})"
-            detail += f"\n    - Stage: {bucket.get('stage', 'N/A')}"
-            detail += f"\n    - Description: {bucket.get('description', 'N/A')}"
-            detail += f"\n    - Created: {bucket.get('created', 'N/A')}"
-            detail += f"\n    - Tables: {bucket.get('tablesCount', 0)}"
-            detail += f"\n    - Size: {bucket.get('dataSizeBytes', 0)} bytes"
-            bucket_details.append(detail)
+    @mcp.tool()
+    async def list_all_buckets_with_tables() -> str:
+        """List all buckets in the project together with the tables in each bucket."""
+        buckets = await get_buckets()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def fetch_tables(bucket_id: str) -> Tuple[Table, ...]:
+            async with semaphore:
+                return await get_bucket_tables(bucket_id)
+
+        tables_lists = await asyncio.gather(
+            *(fetch_tables(bucket.id) for bucket in buckets), return_exceptions=True
+        )
 
-        return header + "\n" + "\n".join(bucket_details)
+        lines = ["# Bucket List", "", f"Total Buckets: {len(buckets)}", "", "## Details"]
+        for bucket, tables in zip(buckets, tables_lists):
+            lines.append(f"### {bucket.name} ({bucket.id})")
+            lines.append(f"    - Stage: {bucket.stage}")
+            if isinstance(tables, BaseException):
+                lines.append(f"    - Tables: failed to list tables: {tables}")
+                continue
+            lines.append(f"    - Tables: {len(tables)}")
+            lines.extend(
+                "        " + _TABLE_SUMMARY_TPL.format(t=table, rows=_rows(table, "unknown"))
+                for table in tables
+            )
+
+        return "\n".join(lines)
 
     @mcp.tool()
     async def get_bucket_metadata(bucket_id: str) -> str:
         """Get detailed information about a specific bucket."""
-        bucket = cast(Dict[str, Any], keboola.storage_client.buckets.detail(bucket_id))
+        bucket = await keboola.get(f"buckets/{bucket_id}")
         return (
             f"Bucket Information:\n"
             f"ID: {bucket['id']}\n"
@@ -265,10 +411,15 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
     @mcp.tool()
     async def get_table_metadata(table_id: str) -> Dict[str, Any]:
         """Get detailed information about a specific table including its DB identifier and column information."""
-        # Get table details directly from the storage client
-        table = cast(Dict[str, Any], keboola.storage_client.tables.detail(table_id))
+        table = await keboola.get(f"tables/{table_id}")
         return table
 
+    @mcp.tool()
+    async def get_table_preview(table_id: str, limit: int = 100) -> str:
+        """Preview the first rows of a specific table as CSV."""
+        data = await keboola.get_table_preview(table_id, limit)
+        return f"```csv\n{data}\n```"
+
     @mcp.tool()
     async def list_component_configs(component_id: str) -> str:
         """List all configurations for a specific component."""
@@ -276,25 +427,15 @@ def create_server(config: Optional[Config] = None) -> FastMCP:
             List[Dict[str, Any]], await keboola.get(f"components/{component_id}/configs")
         )
         return "\n".join(
-            f"Configuration: {config['id']}\n"
-            f"Name: {config['name']}\n"
-            f"Description: {config.get('description', 'No description')}\n"
-            f"Created: {config['created']}\n"
-            f"---"
-            for config in configs
+            _CONFIG_TPL.format_map({**_CONFIG_DEFAULTS, **config}) for config in configs
         )
 
     @mcp.tool()
     async def list_bucket_tables_tool(bucket_id: str) -> str:
         """List all tables in a specific bucket with their basic information."""
-        tables = cast(List[Dict[str, Any]], keboola.storage_client.buckets.list_tables(bucket_id))
+        tables = await get_bucket_tables(bucket_id)
         return "\n".join(
-            f"Table: {table['id']}\n"
-            f"Name: {table.get('name', 'N/A')}\n"
-            f"Rows: {table.get('rowsCount', 'N/A')}\n"
-            f"Size: {table.get('dataSizeBytes', 'N/A')} bytes\n"
-            f"Columns: {', '.join(table.get('columns', []))}\n"
-            f"---"
+            _TABLE_TPL.format(t=table, rows=_rows(table, "N/A"), columns=", ".join(table.columns))
             for table in tables
         )
 
@@ -0,0 +1,213 @@
+"""Tests for the Keboola client wrapper."""
+
+import asyncio
+import os
+import threading
+from typing import Callable, List
+from unittest.mock import MagicMock
+
+import brotli
+import httpx
+import pytest
+
+from keboola_mcp_server.client import KeboolaClient
+
+Handler = Callable[[httpx.Request], httpx.Response]
+
+
+@pytest.fixture
+def mock_client() -> Callable[[Handler], KeboolaClient]:
+    """Create clients whose HTTP traffic is served by a mock transport."""
+
+    def create(handler: Handler) -> KeboolaClient:
+        return KeboolaClient(
+            "test-token", "connection.test.keboola.com", transport=httpx.MockTransport(handler)
+        )
+
+    return create
+
+
+@pytest.fixture
+def requests_seen() -> List[httpx.Request]:
+    return []
+
+
+@pytest.fixture
+def keboola(
+    mock_client: Callable[[Handler], KeboolaClient], requests_seen: List[httpx.Request]
+) -> KeboolaClient:
+    """Create a client recording its requests and answering with a component listing."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(request)
+        return httpx.Response(200, json=[{"id": "keboola.ex-db", "name": "Database"}])
+
+    return mock_client(handler)
+
+
+def test_client_base_url() -> None:
+    """Test the shared HTTP client points at the Storage API."""
+    client = KeboolaClient("test-token", "connection.test.keboola.com")
+    assert client.base_url == "https://connection.test.keboola.com"
+    assert str(client._client.base_url) == "https://connection.test.keboola.com/v2/storage/"
+    assert client._client.headers["X-StorageApi-Token"] == "test-token"
+
+
+@pytest.mark.asyncio
+async def test_get_reuses_client(
+    keboola: KeboolaClient, requests_seen: List[httpx.Request]
+) -> None:
+    """Test requests go through the shared HTTP client."""
+    async with keboola:
+        http_client = keboola._client
+        assert await keboola.get("components") == [{"id": "keboola.ex-db", "name": "Database"}]
+        await keboola.get("components/keboola.ex-db/configs")
+        await keboola.get("components")
+        assert keboola._client is http_client
+
+    assert [str(r.url) for r in requests_seen] == [
+        "https://connection.test.keboola.com/v2/storage/components",
+        "https://connection.test.keboola.com/v2/storage/components/keboola.ex-db/configs",
+    ]
+    assert keboola._client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_get_table_preview_truncates(
+    mock_client: Callable[[Handler], KeboolaClient],
+) -> None:
+    """Test the preview stops after the requested number of rows."""
+    limits: List[str] = []
+    body = 'id,note\n1,plain\n2,"multi\nline"\n3,"quoted ""x"""\n4,last\n'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/v2/storage/tables/in.c-test.data/data-preview"
+        limits.append(request.url.params["limit"])
+        return httpx.Response(200, text=body)
+
+    client = mock_client(handler)
+
+    preview = await client.get_table_preview("in.c-test.data", limit=3)
+    assert preview == 'id,note\n1,plain\n2,"multi\nline"\n3,"quoted ""x"""'
+    assert await client.get_table_preview("in.c-test.data", limit=0) == "id,note"
+    assert limits == ["3", "0"]
+
+
+@pytest.mark.asyncio
+async def test_get_table_preview_keeps_field_line_breaks(
+    mock_client: Callable[[Handler], KeboolaClient],
+) -> None:
+    """Test only newlines split rows and line breaks inside fields are kept as sent."""
+    body = 'id,note\r\n1,p\x0cq\u2028r\r\n2,"a\r\nb"\r\n3,w\r\n'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=body)
+
+    client = mock_client(handler)
+
+    assert await client.get_table_preview("in.c-test.data", limit=2) == (
+        'id,note\r\n1,p\x0cq\u2028r\r\n2,"a\r\nb"'
+    )
+    assert await client.get_table_preview("in.c-test.data", limit=10) == body[:-2]
+
+
+@pytest.mark.asyncio
+async def test_get_caches_responses(
+    keboola: KeboolaClient, requests_seen: List[httpx.Request]
+) -> None:
+    """Test repeated and concurrent GETs share one API call until invalidated."""
+    results = await asyncio.gather(*[keboola.get("buckets") for _ in range(5)])
+    assert all(result == results[0] for result in results)
+    await keboola.get("buckets")
+    assert len(requests_seen) == 1
+
+    keboola.invalidate("components")
+    await keboola.get("buckets")
+    assert len(requests_seen) == 1
+
+    keboola.invalidate("buckets")
+    await keboola.get("buckets")
+    assert len(requests_seen) == 2
+
+    keboola._cache_ttl = 0
+    await keboola.get("buckets")
+    assert len(requests_seen) == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_drops_locks_and_stale_entries(keboola: KeboolaClient) -> None:
+    """Test finished fetches leave no lock behind and expired entries are evicted."""
+    await asyncio.gather(*[keboola.get("tables/in.c-test.data") for _ in range(3)])
+    assert keboola._cache_locks == {}
+
+    keboola._cache_ttl = 0
+    await keboola.get("tables/in.c-test.other")
+    assert list(keboola._cache) == ["tables/in.c-test.other"]
+
+
+@pytest.mark.asyncio
+async def test_download_table_data_runs_in_thread() -> None:
+    """Test the blocking SDK export does not run on the event loop thread."""
+    client = KeboolaClient("test-token", "connection.test.keboola.com")
+    loop_thread = threading.get_ident()
+    export_threads: List[int] = []
+
+    def export_to_file(table_id: str, path_name: str) -> None:
+        export_threads.append(threading.get_ident())
+        with open(os.path.join(path_name, table_id.split(".")[-1]), "w") as f:
+            f.write("id,name\n1,a\n")
+
+    client.storage_client = MagicMock()
+    client.storage_client.tables.export_to_file.side_effect = export_to_file
+
+    assert await client.download_table_data_async("in.c-test.data") == "id,name\n1,a\n"
+    assert export_threads and export_threads[0] != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_get_decodes_compressed_response(
+    mock_client: Callable[[Handler], KeboolaClient],
+) -> None:
+    """Test compressed responses are requested and transparently decoded."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert "br" in request.headers["Accept-Encoding"]
+        return httpx.Response(
+            200,
+            headers={"Content-Encoding": "br"},
+            content=brotli.compress(b'[{"id": "in.c-test"}]'),
+        )
+
+    client = mock_client(handler)
+    assert await client.get("buckets") == [{"id": "in.c-test"}]
+
+
+@pytest.mark.asyncio
+async def test_get_parsed_caches_conversion(
+    keboola: KeboolaClient, requests_seen: List[httpx.Request]
+) -> None:
+    """Test parsed responses are converted once and dropped with the raw response."""
+    parse = MagicMock(side_effect=lambda data: tuple(item["id"] for item in data))
+    parse.__qualname__ = "parse_ids"
+
+    assert await keboola.get_parsed("components", parse) == ("keboola.ex-db",)
+    assert await keboola.get_parsed("components", parse) == ("keboola.ex-db",)
+    assert parse.call_count == 1
+    assert len(requests_seen) == 1
+
+    keboola.invalidate("components")
+    await keboola.get_parsed("components", parse)
+    assert parse.call_count == 2
+    assert len(requests_seen) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_parsed_expires_with_raw_response(keboola: KeboolaClient) -> None:
+    """Test a parsed response is not kept longer than the response it came from."""
+    parse = MagicMock(side_effect=len)
+    parse.__qualname__ = "count"
+
+    await keboola.get("components")
+    fetched_at = keboola._cache["components"][0]
+    await keboola.get_parsed("components", parse)
+    assert keboola._cache["components#count"][0] == fetched_at
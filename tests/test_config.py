@@ -20,6 +20,30 @@ def test_config_from_env(monkeypatch: MonkeyPatch) -> None:
     assert config.log_level == "DEBUG"
 
 
+def test_config_from_env_snowflake(monkeypatch: MonkeyPatch) -> None:
+    """Test Snowflake credentials are read from environment variables."""
+    monkeypatch.setenv("KBC_STORAGE_TOKEN", "test-token")
+    monkeypatch.setenv("KBC_SNOWFLAKE_ACCOUNT", "test-account")
+    monkeypatch.setenv("KBC_SNOWFLAKE_ROLE", "test-role")
+    monkeypatch.delenv("KBC_SNOWFLAKE_USER", raising=False)
+
+    config = Config.from_env()
+    assert config.snowflake_account == "test-account"
+    assert config.snowflake_role == "test-role"
+    assert config.snowflake_user is None
+    assert not hasattr(config, "__dict__")
+
+
+def test_config_positional_arguments() -> None:
+    """Test positional arguments keep the order of the original constructor."""
+    config = Config("tok", "https://test.keboola.com", "acc", "usr", "pwd", "wh", "db", "rl", "sc")
+    assert config.snowflake_account == "acc"
+    assert config.snowflake_database == "db"
+    assert config.snowflake_role == "rl"
+    assert config.snowflake_schema == "sc"
+    assert config.log_level == "INFO"
+
+
 def test_config_missing_token(monkeypatch: MonkeyPatch) -> None:
     """Test error when storage token is missing."""
     monkeypatch.delenv("KBC_STORAGE_TOKEN", raising=False)
@@ -0,0 +1,247 @@
+"""Tests for Snowflake connection handling."""
+
+import asyncio
+import threading
+from typing import Iterator, List, Optional, Tuple
+from unittest.mock import MagicMock, patch
+
+import pytest
+from snowflake.connector.errors import ProgrammingError
+
+from keboola_mcp_server.config import Config
+from keboola_mcp_server.database import ConnectionManager, QueryBatcher
+
+
+@pytest.fixture
+def test_config() -> Config:
+    return Config(
+        storage_token="test-token",
+        snowflake_account="test-account",
+        snowflake_user="test-user",
+        snowflake_password="test-password",
+        snowflake_warehouse="test-warehouse",
+        snowflake_database="test-database",
+    )
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused(test_config: Config) -> None:
+    """Test queries share one connection until it is closed."""
+    manager = ConnectionManager(test_config)
+
+    with patch("snowflake.connector.connect") as mock_connect:
+        first, second = MagicMock(), MagicMock()
+        first.is_closed.return_value = False
+        mock_connect.side_effect = [first, second]
+
+        async with manager.acquire() as conn:
+            assert conn is first
+        async with manager.acquire() as conn:
+            assert conn is first
+        assert mock_connect.call_count == 1
+        assert mock_connect.call_args.kwargs["account"] == "test-account"
+
+        # A connection closed behind our back is replaced
+        first.is_closed.return_value = True
+        async with manager.acquire() as conn:
+            assert conn is second
+        assert mock_connect.call_count == 2
+
+        await manager.close()
+        second.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_connection_dropped_on_failure(test_config: Config) -> None:
+    """Test a connection that fails outside of a query error is not reused."""
+    manager = ConnectionManager(test_config)
+
+    with patch("snowflake.connector.connect") as mock_connect:
+        broken = MagicMock()
+        broken.is_closed.return_value = False
+        mock_connect.side_effect = [broken, MagicMock()]
+
+        with pytest.raises(OSError):
+            async with manager.acquire():
+                raise OSError("connection reset")
+        broken.close.assert_called_once()
+
+        async with manager.acquire() as conn:
+            assert conn is not broken
+
+
+@pytest.mark.asyncio
+async def test_failed_connection_closed_after_last_user(test_config: Config) -> None:
+    """Test a connection dropped on failure stays open for blocks still using it."""
+    manager = ConnectionManager(test_config)
+
+    with patch("snowflake.connector.connect") as mock_connect:
+        shared = MagicMock()
+        shared.is_closed.return_value = False
+        mock_connect.side_effect = [shared, MagicMock()]
+
+        async with manager.acquire() as conn:
+            with pytest.raises(OSError):
+                async with manager.acquire():
+                    raise OSError("connection reset")
+            shared.close.assert_not_called()
+
+            async with manager.acquire() as replacement:
+                assert replacement is not shared
+        shared.close.assert_called_once()
+
+
+class FakeCursor:
+    """Cursor returning one single-row result set per executed statement."""
+
+    def __init__(self, executed: List[Tuple[str, int]]) -> None:
+        self.executed = executed
+        self.results: List[str] = []
+        self.pending: List[Tuple[str, ...]] = []
+
+    def execute(self, sql: str, num_statements: int = 1) -> None:
+        self.executed.append((sql, num_statements))
+        statements = sql.split("\n;\n")
+        if any("fail" in statement for statement in statements):
+            raise ProgrammingError("query failed")
+        self.results = statements
+        self._next_result()
+
+    def _next_result(self) -> None:
+        self.description = [("query",)]
+        self.pending = [(self.results.pop(0),)]
+
+    def fetchmany(self, size: int) -> List[Tuple[str, ...]]:
+        rows, self.pending = self.pending, []
+        return rows
+
+    def nextset(self) -> Optional["FakeCursor"]:
+        if not self.results:
+            return None
+        self._next_result()
+        return self
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def executed(test_config: Config) -> Iterator[List[Tuple[str, int]]]:
+    executed: List[Tuple[str, int]] = []
+    with patch("snowflake.connector.connect") as mock_connect:
+        mock_connect.return_value.is_closed.return_value = False
+        mock_connect.return_value.cursor.side_effect = lambda: FakeCursor(executed)
+        yield executed
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_queries(
+    test_config: Config, executed: List[Tuple[str, int]]
+) -> None:
+    """Test concurrent queries are sent as one multi-statement request."""
+    batcher = QueryBatcher(ConnectionManager(test_config))
+
+    results = await asyncio.gather(*(batcher.execute(f"SELECT {i}") for i in range(3)))
+
+    assert results == ["query\r\nSELECT 0\r\n", "query\r\nSELECT 1\r\n", "query\r\nSELECT 2\r\n"]
+    assert executed == [("SELECT 0\n;\nSELECT 1\n;\nSELECT 2", 3)]
+
+
+@pytest.mark.asyncio
+async def test_batcher_isolates_failures(
+    test_config: Config, executed: List[Tuple[str, int]]
+) -> None:
+    """Test a failing query in a batch only fails its own caller."""
+    batcher = QueryBatcher(ConnectionManager(test_config))
+
+    ok, failed, alone = await asyncio.gather(
+        batcher.execute("SELECT 1"),
+        batcher.execute("SELECT fail"),
+        batcher.execute("SELECT 2; SELECT 3"),
+        return_exceptions=True,
+    )
+
+    assert ok == "query\r\nSELECT 1\r\n"
+    assert isinstance(failed, ProgrammingError)
+    assert isinstance(alone, str)
+    assert ("SELECT 1\n;\nSELECT fail", 2) in executed
+    assert ("SELECT 1", 1) in executed
+    assert ("SELECT 2; SELECT 3", 1) in executed
+
+
+@pytest.mark.asyncio
+async def test_batcher_joins_statements_safely(
+    test_config: Config, executed: List[Tuple[str, int]]
+) -> None:
+    """Test trailing semicolons and comments do not change the statement count."""
+    batcher = QueryBatcher(ConnectionManager(test_config))
+
+    await asyncio.gather(
+        batcher.execute("SELECT 1;"),
+        batcher.execute("SELECT 2 -- note"),
+        batcher.execute("select 3"),
+    )
+
+    assert executed == [("SELECT 1\n;\nSELECT 2 -- note\n;\nselect 3", 3)]
+
+
+@pytest.mark.asyncio
+async def test_batcher_runs_writes_alone(
+    test_config: Config, executed: List[Tuple[str, int]]
+) -> None:
+    """Test statements that are not read-only are never batched or retried."""
+    batcher = QueryBatcher(ConnectionManager(test_config))
+
+    await asyncio.gather(
+        batcher.execute("SELECT 1"),
+        batcher.execute("INSERT INTO t VALUES (1)"),
+        batcher.execute("SELECT 2"),
+    )
+
+    assert sorted(executed) == [
+        ("INSERT INTO t VALUES (1)", 1),
+        ("SELECT 1\n;\nSELECT 2", 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batcher_fails_queries_without_results(
+    test_config: Config, executed: List[Tuple[str, int]]
+) -> None:
+    """Test callers are failed rather than left waiting when result sets are missing."""
+    batcher = QueryBatcher(ConnectionManager(test_config))
+
+    with patch.object(FakeCursor, "nextset", return_value=None):
+        first, second = await asyncio.gather(
+            batcher.execute("SELECT 1"), batcher.execute("SELECT 2"), return_exceptions=True
+        )
+
+    assert first == "query\r\nSELECT 1\r\n"
+    assert isinstance(second, RuntimeError)
+
+
+@pytest.mark.asyncio
+async def test_batcher_close_fails_in_flight_queries(
+    test_config: Config, executed: List[Tuple[str, int]]
+) -> None:
+    """Test close() fails queries that are running or still being collected."""
+    batcher = QueryBatcher(ConnectionManager(test_config), max_wait=10)
+    started = threading.Event()
+    release = threading.Event()
+
+    def execute(cursor: FakeCursor, sql: str, num_statements: int = 1) -> None:
+        started.set()
+        release.wait(5)
+
+    with patch.object(FakeCursor, "execute", execute):
+        running = asyncio.ensure_future(batcher.execute("INSERT INTO t VALUES (1)"))
+        await asyncio.to_thread(started.wait, 5)
+        collecting = asyncio.ensure_future(batcher.execute("SELECT 1"))
+        await asyncio.sleep(0.01)
+
+        await batcher.close()
+        release.set()
+
+    for caller in (running, collecting):
+        assert caller.done()
+        assert isinstance(caller.exception(), RuntimeError)
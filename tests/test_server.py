@@ -1,11 +1,20 @@
 """Tests for server functionality."""
 
+import json
+
 import pytest
+from mcp.types import TextContent
 from unittest.mock import AsyncMock, MagicMock, patch
-from typing import AsyncGenerator, Dict, List
+from typing import AsyncGenerator, Dict, List, Optional, cast
 
 from keboola_mcp_server.config import Config
-from keboola_mcp_server.server import create_server, TableDetail, TableColumnInfo
+from keboola_mcp_server.server import (
+    TableColumnInfo,
+    TableDetail,
+    _build_select,
+    _column_identifiers,
+    create_server,
+)
 
 
 @pytest.fixture
@@ -26,21 +35,21 @@ def test_config():
 @pytest.fixture
 def mock_table_detail() -> TableDetail:
     """Create a mock table detail."""
-    return {
-        "id": "in.c-test.test-table",
-        "name": "test-table",
-        "primary_key": ["id"],
-        "created": "2024-01-01T00:00:00Z",
-        "row_count": 100,
-        "data_size_bytes": 1000,
-        "columns": ["id", "name", "value"],
-        "column_identifiers": [
+    return TableDetail(
+        id="in.c-test.test-table",
+        name="test-table",
+        primary_key=("id",),
+        created="2024-01-01T00:00:00Z",
+        row_count=100,
+        data_size_bytes=1000,
+        columns=("id", "name", "value"),
+        column_identifiers=(
             TableColumnInfo(name="id", db_identifier='"id"'),
             TableColumnInfo(name="name", db_identifier='"name"'),
-            TableColumnInfo(name="value", db_identifier='"value"')
-        ],
-        "db_identifier": '"KEBOOLA_test"."in.c-test"."test-table"'
-    }
+            TableColumnInfo(name="value", db_identifier='"value"'),
+        ),
+        db_identifier='"KEBOOLA_test"."in.c-test"."test-table"',
+    )
 
 
 @pytest.mark.asyncio
@@ -136,4 +145,142 @@ async def test_query_table_tool(test_config) -> None:
     with patch('snowflake.connector.connect', return_value=mock_conn):
         result = await server.call_tool('query_table', {"sql_query": 'SELECT * FROM "test_table"'})
         assert isinstance(result, str)
-        assert "test" in result 
\ No newline at end of file
+        assert "test" in result 
+
+
+@pytest.mark.asyncio
+async def test_list_all_buckets_with_tables(test_config: Config) -> None:
+    """Test per-bucket table listings are fetched and formatted together."""
+    responses = {
+        "buckets": [
+            {"id": "in.c-a", "name": "a", "stage": "in"},
+            {"id": "in.c-b", "name": "b", "stage": "in"},
+        ],
+        "buckets/in.c-a/tables": [{"id": "in.c-a.t1", "name": "t1", "rowsCount": 5}],
+        "buckets/in.c-b/tables": [],
+    }
+
+    with patch("keboola_mcp_server.server.KeboolaClient") as mock_client:
+        mock_client.return_value.get_parsed = AsyncMock(
+            side_effect=lambda endpoint, parse: parse(responses[endpoint])
+        )
+
+        server = create_server(test_config)
+        result = await server.call_tool("list_all_buckets_with_tables", {})
+
+    assert isinstance(result[0], TextContent)
+    text = result[0].text
+    assert "Total Buckets: 2" in text
+    assert "### a (in.c-a)\n    - Stage: in\n    - Tables: 1" in text
+    assert "        - in.c-a.t1: t1 (Rows: 5)" in text
+    assert "### b (in.c-b)\n    - Stage: in\n    - Tables: 0" in text
+
+
+@pytest.mark.asyncio
+async def test_query_table_fetches_in_batches(test_config: Config) -> None:
+    """Test query results are written to CSV batch by batch."""
+    mock_cursor = MagicMock()
+    mock_cursor.description = [("id",), ("name",)]
+    mock_cursor.fetchmany.side_effect = [[("id1", "name1")], [("id2", "name2")], []]
+
+    with patch("snowflake.connector.connect") as mock_connect:
+        mock_connect.return_value.is_closed.return_value = False
+        mock_connect.return_value.cursor.return_value = mock_cursor
+
+        server = create_server(test_config)
+        result = await server.call_tool("query_table", {"sql_query": "SELECT * FROM test"})
+
+    assert isinstance(result[0], TextContent)
+    assert result[0].text.splitlines() == ["id,name", "id1,name1", "id2,name2"]
+    mock_cursor.fetchall.assert_not_called()
+    mock_cursor.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_list_all_buckets(test_config: Config) -> None:
+    """Test the bucket list is rendered with defaults for missing fields."""
+    buckets = [{"id": "in.c-a", "name": "a", "stage": "in", "tablesCount": 2}]
+
+    with patch("keboola_mcp_server.server.KeboolaClient") as mock_client:
+        mock_client.return_value.get_parsed = AsyncMock(
+            side_effect=lambda endpoint, parse: parse(buckets)
+        )
+
+        server = create_server(test_config)
+        result = await server.call_tool("list_all_buckets", {})
+
+    assert isinstance(result[0], TextContent)
+    assert result[0].text == (
+        "# Bucket List\n\nTotal Buckets: 1\n\n## Details\n"
+        "### a (in.c-a)\n"
+        "    - Stage: in\n"
+        "    - Description: N/A\n"
+        "    - Created: N/A\n"
+        "    - Tables: 2\n"
+        "    - Size: 0 bytes"
+    )
+
+
+@pytest.mark.asyncio
+async def test_list_bucket_tables_unknown_rows(test_config: Config) -> None:
+    """Test tables without a row count are listed with an unknown count."""
+    tables = [{"id": "in.c-a.t1", "name": "t1"}, {"id": "in.c-a.t2", "name": "t2", "rowsCount": 3}]
+
+    with patch("keboola_mcp_server.server.KeboolaClient") as mock_client:
+        mock_client.return_value.get_parsed = AsyncMock(
+            side_effect=lambda endpoint, parse: parse(tables)
+        )
+
+        server = create_server(test_config)
+        result = await server.read_resource("keboola://buckets/in.c-a/tables")
+
+    assert result == "- in.c-a.t1: t1 (Rows: unknown)\n- in.c-a.t2: t2 (Rows: 3)"
+
+
+@pytest.mark.asyncio
+async def test_table_detail_column_identifiers(test_config: Config) -> None:
+    """Test column identifiers are quoted and reused across table detail reads."""
+    mock_table = {
+        "id": "in.c-test.test-table",
+        "name": "test-table",
+        "columns": ["id", "name"],
+    }
+
+    with patch("keboola_mcp_server.server.KeboolaClient") as mock_client:
+        mock_client.return_value.get = AsyncMock(return_value=mock_table)
+
+        server = create_server(test_config)
+        _column_identifiers.cache_clear()
+        first = await server.read_resource("keboola://tables/in.c-test.test-table")
+        second = await server.read_resource("keboola://tables/in.c-test.test-table")
+
+    detail = json.loads(first)
+    assert detail["column_identifiers"] == [
+        {"name": "id", "db_identifier": '"id"'},
+        {"name": "name", "db_identifier": '"name"'},
+    ]
+    assert detail["db_identifier"] == '"KEBOOLA_test"."in.c-test"."test-table"'
+    assert first == second
+    cache_info = _column_identifiers.cache_info()
+    assert (cache_info.misses, cache_info.hits) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "where, limit, expected",
+    [
+        (None, None, 'SELECT "id" FROM "db"."t"'),
+        (None, 10, 'SELECT "id" FROM "db"."t" LIMIT 10'),
+        ("id > 1", None, 'SELECT "id" FROM "db"."t" WHERE id > 1'),
+        ("id > 1", 10, 'SELECT "id" FROM "db"."t" WHERE id > 1 LIMIT 10'),
+    ],
+)
+def test_build_select(where: Optional[str], limit: Optional[int], expected: str) -> None:
+    """Test the SELECT template is chosen from the where and limit arguments."""
+    assert _build_select('"id"', '"db"."t"', where, limit) == expected
+
+
+def test_build_select_coerces_limit() -> None:
+    """Test only an integer is ever interpolated into the LIMIT clause."""
+    assert _build_select("*", '"db"."t"', limit=cast(int, "5")) == 'SELECT * FROM "db"."t" LIMIT 5'
+    with pytest.raises(ValueError):
+        _build_select("*", '"db"."t"', limit=cast(int, "5; DROP TABLE t"))